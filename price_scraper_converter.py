@@ -1,83 +1,156 @@
+import asyncio  # Concurrent page fetching
+import csv  # CSV file operations
+import functools  # Rate caching
+import math  # Page count calculation
+import os  # Display detection
+import sys  # Terminal detection
+import time  # Cache expiry
+import aiohttp  # Async HTTP requests
+import orjson  # Fast JSON decoding
 import requests  # HTTP requests
-from bs4 import BeautifulSoup  # HTML parsing
-import pandas as pd  # Data handling
-import matplotlib.pyplot as plt  # Plotting
+from requests.adapters import HTTPAdapter  # Connection pooling
+from urllib3.util.retry import Retry  # Retry with backoff
+from selectolax.lexbor import LexborHTMLParser  # HTML parsing
+import numpy as np  # Vectorised conversion
+import matplotlib  # Plot backend selection
+from concurrent.futures import ThreadPoolExecutor  # Parallel parsing
 from datetime import datetime  # Timestamping
-import csv  # CSV file operations
-import time  # Delay handling
+
+HEADLESS = not sys.stdout.isatty() or (
+    sys.platform.startswith("linux") and not (os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+)  # No terminal or no display server: render off-screen
+if HEADLESS:
+    matplotlib.use("Agg")  # Skip GUI backend setup when no window can be shown
+import matplotlib.pyplot as plt  # Plotting
 
 BASE_URL = "https://books.toscrape.com/catalogue/page-{}.html"  # URL template for book pages
 EXCHANGE_API = "https://api.exchangerate-api.com/v4/latest/GBP"  # Exchange rate API URL
-HEADERS = {'User-Agent': 'Mozilla/5.0'}  # Request headers for scraping
-
-def scrape_books(count=10):
-    # Scrape book titles and prices from multiple pages until count reached
-    books = []
-    page = 1
-
-    while len(books) < count:
+HEADERS = {'User-Agent': 'Mozilla/5.0', 'Accept-Encoding': 'gzip, deflate'}  # Request headers for scraping
+BOOKS_PER_PAGE = 20  # Books listed on each catalogue page
+MAX_PAGES = 50  # Pages in the books.toscrape.com catalogue
+FETCH_CONCURRENCY = 10  # Pages downloaded at the same time
+PARSE_WORKERS = 4  # Threads used to parse fetched pages
+RETRY_TOTAL = 3  # Retries per request on transient failures
+RETRY_BACKOFF = 0.3  # urllib3 backoff_factor: waits 0, 0.6, 1.2 s between retries
+RETRY_MAX_WAIT = 10  # Longest wait in seconds between page retries, even if Retry-After asks for more
+RETRY_STATUSES = (429, 500, 502, 503, 504)  # Status codes worth retrying
+RATE_TTL = 3600  # Seconds an exchange rate stays cached
+
+SESSION = requests.Session()  # Shared session so connections are kept alive between requests
+SESSION.headers.update(HEADERS)
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=20,
+    max_retries=Retry(
+        total=RETRY_TOTAL,
+        backoff_factor=RETRY_BACKOFF,
+        status_forcelist=RETRY_STATUSES,
+    ),
+))
+
+async def fetch_page(session, page, limit):
+    # Fetch one catalogue page and return its raw HTML bytes, retrying transient failures with backoff
+    for attempt in range(RETRY_TOTAL + 1):
+        wait = 0 if attempt == 0 else RETRY_BACKOFF * 2 ** attempt  # Same 0, 0.6, 1.2 s steps as urllib3
         try:
-            response = requests.get(BASE_URL.format(page), headers=HEADERS, timeout=5)  # Fetch page
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, "html.parser")  # Parse HTML
+            async with limit, session.get(BASE_URL.format(page)) as response:  # Timeout starts once a slot is free
+                if response.status not in RETRY_STATUSES or attempt == RETRY_TOTAL:
+                    response.raise_for_status()
+                    return await response.read()
+                retry_after = response.headers.get("Retry-After", "").strip()
+                if retry_after.isdigit():
+                    wait = int(retry_after)  # Server asked for a specific delay in seconds
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            if attempt == RETRY_TOTAL:
+                raise  # Out of retries
+        await asyncio.sleep(min(wait, RETRY_MAX_WAIT))
+
+async def fetch_pages(pages):
+    # Download catalogue pages 1..pages concurrently and return their raw HTML in page order
+    async with aiohttp.ClientSession(headers=HEADERS, timeout=aiohttp.ClientTimeout(total=5)) as session:
+        limit = asyncio.Semaphore(FETCH_CONCURRENCY)  # Bound in-flight requests
+        results = await asyncio.gather(
+            *(fetch_page(session, page, limit) for page in range(1, pages + 1)),
+        )  # Fetch up to FETCH_CONCURRENCY pages at a time; the first failure after retries is raised
+    return results
 
-            for book in soup.select(".product_pod"):  # Loop through books on page
-                title = book.h3.a["title"]  # Extract book title
-                price = float(book.select_one(".price_color").text.replace("£", ""))  # Extract price
-                books.append({"name": title, "price_gbp": price})  # Add to list
-
-                if len(books) == count:
-                    break  # Stop if desired count reached
-
-            page += 1  # Next page
-
-        except Exception as e:
-            print(f"Error fetching page {page}: {e}")  # Print error
-            time.sleep(1)  # Wait before stopping
-            break
-
-    return books  # Return list of books
+def scrape_books(count=10):
+    # Scrape book titles and prices: fetch pages concurrently, then parse them off the event loop
+    pages = min(math.ceil(count / BOOKS_PER_PAGE), MAX_PAGES)  # Never ask for pages past the catalogue
+    pages_html = asyncio.run(fetch_pages(pages))
+
+    if len(pages_html) > 1:
+        with ThreadPoolExecutor(max_workers=PARSE_WORKERS) as executor:
+            trees = list(executor.map(LexborHTMLParser, pages_html))  # Parse pages in parallel
+    else:
+        trees = [LexborHTMLParser(html) for html in pages_html]  # One page: no pool needed
+
+    names, prices = [], []  # One list per column
+    for tree in trees:
+        links = tree.css(".product_pod h3 a")  # All titles on the page in one query
+        tags = tree.css(".product_pod .price_color")  # All prices on the page in one query
+        for link, tag in zip(links, tags, strict=True):  # Pair them up book by book; a mismatch raises
+            names.append(link.attributes["title"])  # Extract book title
+            prices.append(float(tag.text().strip().lstrip("Â£")))  # Extract price, dropping the currency prefix
+
+    return {"name": names[:count], "price_gbp": prices[:count]}  # Return columns, trimmed to count
+
+@functools.lru_cache(maxsize=32)
+def fetch_rate(currency, ts_bucket):
+    # Request the exchange rate for currency; ts_bucket only keys the cache
+    response = SESSION.get(EXCHANGE_API, timeout=5)  # Request rates
+    data = orjson.loads(response.content)
+    return data['rates'].get(currency)  # Get rate, or None if the currency is unknown
 
 def get_rate(currency):
-    # Fetch exchange rate for currency; fallback to default if fails
+    # Fetch exchange rate for currency (cached for RATE_TTL seconds); fallback to default if fails
     try:
-        response = requests.get(EXCHANGE_API, timeout=5)  # Request rates
-        data = response.json()
-        return data['rates'].get(currency.upper(), 180.0)  # Get rate or default
+        rate = fetch_rate(currency.upper(), int(time.time() // RATE_TTL))
     except Exception as e:
         print(f"Could not get exchange rate: {e}")
-        return 180.0
+        return 180.0  # Failures are not cached, so the next call retries
+    if rate is None:
+        print(f"Could not get exchange rate: no rate for {currency.upper()}")
+        return 180.0  # Default is applied here, outside the cache
+    return rate
 
 def convert(books, rate, currency):
-    # Convert GBP prices to target currency and add timestamp
+    # Convert GBP price column to target currency in one vectorised multiply and add timestamp column
     now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    for book in books:
-        book[f"price_{currency.lower()}"] = round(book["price_gbp"] * rate, 2)
-        book["timestamp"] = now
+    prices = np.asarray(books["price_gbp"], dtype=np.float64)
+    books[f"price_{currency.lower()}"] = np.round(prices * rate, 2).tolist()  # Back to plain floats
+    books["timestamp"] = [now] * len(prices)
     return books
 
 def save_csv(data, filename="converted_prices.csv"):
-    # Save book data as CSV file
+    # Save book columns as CSV file
     with open(filename, "w", newline='', encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=data[0].keys())
-        writer.writeheader()
-        writer.writerows(data)
+        writer = csv.writer(f)
+        writer.writerow(data.keys())  # Header row
+        writer.writerows(zip(*data.values()))  # Columns back to rows
 
 def show_table(data, currency):
-    # Display book data as a pandas DataFrame and print key columns
-    df = pd.DataFrame(data)
-    print(df[["name", "price_gbp", f"price_{currency.lower()}", "timestamp"]])
-    return df
+    # Print book columns as an aligned plain-text table
+    key = f"price_{currency.lower()}"
+    print("{:<40} {:>9} {:>12} {:<20}".format("name", "price_gbp", key, "timestamp"))
+    for row in zip(data["name"], data["price_gbp"], data[key], data["timestamp"]):
+        print("{:<40.40} {:>9.2f} {:>12.2f} {:<20}".format(*row))
 
-def plot(df, currency):
+def plot(data, currency, filename="prices.png"):
     # Plot GBP and converted prices side by side in bar chart
-    plt.bar(df["name"], df["price_gbp"], label="GBP", alpha=0.6)
-    plt.bar(df["name"], df[f"price_{currency.lower()}"], label=currency.upper(), alpha=0.6)
-    plt.xticks(rotation=90)  # Rotate x labels
+    x = np.arange(len(data["name"]))  # Bar group positions
+    width = 0.4
+    plt.bar(x - width / 2, data["price_gbp"], width=width, label="GBP")
+    plt.bar(x + width / 2, data[f"price_{currency.lower()}"], width=width, label=currency.upper())
+    plt.xticks(x, data["name"], rotation=90)  # Label groups with book names, rotated
     plt.title(f"GBP vs {currency.upper()} Prices")
     plt.tight_layout()
     plt.legend()
-    plt.show()
+    plt.savefig(filename, dpi=100)  # Save chart to file
+    print(f"Chart saved to {os.path.abspath(filename)}")
+    if not HEADLESS:
+        plt.show()
+    plt.close()
 
 def main():
     # Main workflow: input, scrape, convert, save, display, optionally plot
@@ -93,8 +166,12 @@ def main():
 
     currency = input("Target currency (e.g., USD): ").strip().upper() or "KES"  # Target currency
 
-    books = scrape_books(count)  # Scrape books
-    if not books:
+    try:
+        books = scrape_books(count)  # Scrape books
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        print(f"Error fetching books: {e}")  # Retries exhausted
+        return
+    if not books["name"]:
         print("No books found. Exiting.")
         return
 
@@ -103,10 +180,11 @@ def main():
     books = convert(books, rate, currency)  # Convert prices
 
     save_csv(books)  # Save data to CSV
-    df = show_table(books, currency)  # Show data table
+    show_table(books, currency)  # Show data table
 
     if input("Show chart? (y/n): ").lower() == 'y':  # Optionally plot
-        plot(df, currency)
+        plot(books, currency)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with SESSION:  # Close pooled connections on exit
+        main()
\ No newline at end of file